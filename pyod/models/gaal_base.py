@@ -13,11 +13,12 @@ import math
 
 import keras
 from keras.layers import Input, Dense
-from keras.models import Sequential, Model
+from keras.models import Model
 
 
 # TODO: create a base class for so_gaal and mo_gaal
-def create_discriminator(latent_size, data_size):  # pragma: no cover
+def create_discriminator(latent_size, data_size, dtype=None,
+                         seed=None):  # pragma: no cover
     """Create the discriminator of the GAN for a given latent size.
 
     Parameters
@@ -28,28 +29,40 @@ def create_discriminator(latent_size, data_size):  # pragma: no cover
     data_size : int
         Size of the input data.
 
+    dtype : str or None, optional (default=None)
+        The dtype policy of the hidden layer, e.g. 'mixed_float16'. If None,
+        the global Keras policy is used. The output layer always computes
+        in float32 for a numerically stable sigmoid.
+
+    seed : int or None, optional (default=None)
+        The seed of the kernel initializers. If None, the initial weights
+        are drawn non-deterministically.
+
     Returns
     -------
     D : Keras model() object
         Returns a model() object.
     """
 
-    dis = Sequential()
-    dis.add(Dense(int(math.ceil(math.sqrt(data_size))),
-                  input_dim=latent_size, activation='relu',
-                  kernel_initializer=keras.initializers.VarianceScaling(
-                      scale=1.0, mode='fan_in', distribution='normal',
-                      seed=None)))
-    dis.add(Dense(1, activation='sigmoid',
-                  kernel_initializer=keras.initializers.VarianceScaling(
-                      scale=1.0, mode='fan_in', distribution='normal',
-                      seed=None)))
+    # The hidden layer has sqrt(data_size) units, rounded up to a multiple
+    # of 16 so that the matmuls map onto full SIMD lanes and Tensor Core
+    # tiles
+    n_hidden = (int(math.ceil(math.sqrt(data_size))) + 15) // 16 * 16
+
     data = Input(shape=(latent_size,))
-    fake = dis(data)
+    hidden = Dense(n_hidden, activation='relu',
+                   kernel_initializer=keras.initializers.VarianceScaling(
+                       scale=1.0, mode='fan_in', distribution='normal',
+                       seed=seed), dtype=dtype)(data)
+    fake = Dense(1, activation='sigmoid',
+                 kernel_initializer=keras.initializers.VarianceScaling(
+                     scale=1.0, mode='fan_in', distribution='normal',
+                     seed=None if seed is None else seed + 1),
+                 dtype='float32')(hidden)
     return Model(data, fake)
 
 
-def create_generator(latent_size):  # pragma: no cover
+def create_generator(latent_size, dtype=None):  # pragma: no cover
     """Create the generator of the GAN for a given latent size.
 
     Parameters
@@ -57,19 +70,21 @@ def create_generator(latent_size):  # pragma: no cover
     latent_size : int
         The size of the latent space of the generator
 
+    dtype : str or None, optional (default=None)
+        The dtype policy of the layers, e.g. 'mixed_float16'. If None, the
+        global Keras policy is used.
+
     Returns
     -------
     D : Keras model() object
         Returns a model() object.
     """
 
-    gen = Sequential()
-    gen.add(Dense(latent_size, input_dim=latent_size, activation='relu',
-                  kernel_initializer=keras.initializers.Identity(
-                      gain=1.0)))
-    gen.add(Dense(latent_size, activation='relu',
-                  kernel_initializer=keras.initializers.Identity(
-                      gain=1.0)))
     latent = Input(shape=(latent_size,))
-    fake_data = gen(latent)
+    hidden = Dense(latent_size, activation='relu',
+                   kernel_initializer=keras.initializers.Identity(
+                       gain=1.0), dtype=dtype)(latent)
+    fake_data = Dense(latent_size, activation='relu',
+                      kernel_initializer=keras.initializers.Identity(
+                          gain=1.0), dtype=dtype)(hidden)
     return Model(latent, fake_data)
@@ -16,6 +16,8 @@ import numpy as np
 from keras.layers import Input
 from keras.models import Model
 from keras.optimizers import SGD
+from keras.optimizers.schedules import InverseTimeDecay
+from keras.utils import Progbar
 
 from sklearn.utils import check_array
 from sklearn.utils.validation import check_is_fitted
@@ -62,6 +64,13 @@ class MO_GAAL(BaseDetector):
     momentum : float, optional (default=0.9)
         The momentum parameter for SGD.
 
+    verbose : int, optional (default=0)
+        Verbosity mode.
+
+        - 0 = silent
+        - 1 = progress bar
+        - 2 = one line per epoch.
+
     Attributes
     ----------
     decision_scores_ : numpy array of shape (n_samples,)
@@ -82,7 +91,7 @@ class MO_GAAL(BaseDetector):
     """
 
     def __init__(self, k=10, stop_epochs=20, lr_d=0.01, lr_g=0.0001,
-                 decay=1e-6, momentum=0.9, contamination=0.1):
+                 decay=1e-6, momentum=0.9, verbose=0, contamination=0.1):
         super(MO_GAAL, self).__init__(contamination=contamination)
         self.k = k
         self.stop_epochs = stop_epochs
@@ -90,6 +99,7 @@ class MO_GAAL(BaseDetector):
         self.lr_g = lr_g
         self.decay = decay
         self.momentum = momentum
+        self.verbose = verbose
 
     def fit(self, X, y=None):
         """Fit detector. y is ignored in unsupervised methods.
@@ -118,9 +128,11 @@ class MO_GAAL(BaseDetector):
         data_size = X.shape[0]
         # Create discriminator
         self.discriminator = create_discriminator(latent_size, data_size)
+        # The learning rates decay as lr / (1 + decay * iterations)
         self.discriminator.compile(
-            optimizer=SGD(lr=self.lr_d, decay=self.decay,
-                          momentum=self.momentum), loss='binary_crossentropy')
+            optimizer=SGD(learning_rate=InverseTimeDecay(
+                self.lr_d, decay_steps=1, decay_rate=self.decay),
+                momentum=self.momentum), loss='binary_crossentropy')
 
         # Create k combine models
         for i in range(self.k):
@@ -132,21 +144,26 @@ class MO_GAAL(BaseDetector):
             names['combine_model' + str(i)] = Model(latent,
                                                     names['fake' + str(i)])
             names['combine_model' + str(i)].compile(
-                optimizer=SGD(lr=self.lr_g,
-                              decay=self.decay,
-                              momentum=self.momentum),
+                optimizer=SGD(learning_rate=InverseTimeDecay(
+                    self.lr_g, decay_steps=1, decay_rate=self.decay),
+                    momentum=self.momentum),
                 loss='binary_crossentropy')
 
+        batch_size = min(500, data_size)
+        num_batches = int(data_size / batch_size)
+
+        # The discriminator labels do not change across iterations
+        y = np.concatenate([np.ones(batch_size, dtype=np.float32),
+                            np.zeros(batch_size, dtype=np.float32)])
+
         # Start iteration
         for epoch in range(epochs):
-            print('Epoch {} of {}'.format(epoch + 1, epochs))
-            batch_size = min(500, data_size)
-            num_batches = int(data_size / batch_size)
+            # Report the progress the way Keras fit does
+            if self.verbose >= 1:
+                print('Epoch {}/{}'.format(epoch + 1, epochs))
+            progbar = Progbar(num_batches, verbose=self.verbose)
 
             for index in range(num_batches):
-                print('\nTesting for epoch {} index {}:'.format(epoch + 1,
-                                                                index + 1))
-
                 # Generate noise
                 noise_size = batch_size
                 noise = np.random.uniform(0, 1, (int(noise_size), latent_size))
@@ -185,7 +202,6 @@ class MO_GAAL(BaseDetector):
                     else:
                         x = np.concatenate(
                             (x, names['generated_data' + str(i)]))
-                y = np.array([1] * batch_size + [0] * int(noise_size))
 
                 # Train discriminator
                 discriminator_loss = self.discriminator.train_on_batch(x, y)
@@ -193,13 +209,13 @@ class MO_GAAL(BaseDetector):
                     discriminator_loss)
 
                 # Get the target value of sub-generator
-                pred_scores = self.discriminator.predict(X)
+                pred_scores = self.discriminator.predict(X, verbose=0)
 
                 for i in range(self.k):
                     names['T' + str(i)] = np.percentile(pred_scores,
                                                         i / self.k * 100)
-                    names['trick' + str(i)] = np.array(
-                        [float(names['T' + str(i)])] * noise_size)
+                    names['trick' + str(i)] = np.full(
+                        noise_size, names['T' + str(i)], dtype=np.float32)
 
                 # Train generator
                 noise = np.random.uniform(0, 1, (int(noise_size), latent_size))
@@ -215,7 +231,7 @@ class MO_GAAL(BaseDetector):
                     for i in range(self.k):
                         names['sub_generator' + str(i) + '_loss'] = names[
                             'combine_model' + str(i)].evaluate(noise, names[
-                            'trick' + str(i)])
+                            'trick' + str(i)], verbose=0)
                         self.train_history[
                             'sub_generator{}_loss'.format(i)].append(
                             names['sub_generator' + str(i) + '_loss'])
@@ -226,13 +242,16 @@ class MO_GAAL(BaseDetector):
                         'sub_generator' + str(i) + '_loss']
                 generator_loss = generator_loss / self.k
                 self.train_history['generator_loss'].append(generator_loss)
+                progbar.update(index + 1, values=[
+                    ('discriminator_loss', discriminator_loss),
+                    ('generator_loss', generator_loss)])
 
                 # Stop training generator
                 if epoch + 1 > self.stop_epochs:
                     stop = 1
 
         # Detection result
-        self.decision_scores_ = self.discriminator.predict(X)
+        self.decision_scores_ = self.discriminator.predict(X, verbose=0)
         self._process_decision_scores()
         return self
 
@@ -256,5 +275,5 @@ class MO_GAAL(BaseDetector):
         """
         check_is_fitted(self, ['discriminator'])
         X = check_array(X)
-        pred_scores = self.discriminator.predict(X)
+        pred_scores = self.discriminator.predict(X, verbose=0)
         return pred_scores
@@ -9,22 +9,143 @@ https://github.com/leibinghe/GAAL-based-outlier-detection
 from __future__ import division
 from __future__ import print_function
 
-from collections import defaultdict
-
 import numpy as np
+import tensorflow as tf
 
-from keras.layers import Input
+from keras.callbacks import LambdaCallback
+from keras.losses import BinaryCrossentropy
+from keras.mixed_precision import LossScaleOptimizer
 from keras.models import Model
 from keras.optimizers import SGD
+from keras.optimizers.schedules import InverseTimeDecay
 
 from sklearn.utils import check_array
+from sklearn.utils import check_random_state
 from sklearn.utils.validation import check_is_fitted
 
+from ..utils.utility import MAX_INT
 from .base import BaseDetector
 from .gaal_base import create_discriminator
 from .gaal_base import create_generator
 
 
+class _SOGAAL_GAN(Model):
+    """Combined generator and discriminator of SO_GAAL. Calling the model
+    scores generated data; ``fit`` runs one discriminator and one generator
+    update per batch of real data.
+
+    Parameters
+    ----------
+    generator : Keras model() object
+        The generator of the GAN.
+
+    discriminator : Keras model() object
+        The discriminator of the GAN.
+
+    noise_generator : tf.random.Generator
+        The random number generator of the noise fed to the generator.
+
+    n_steps : int
+        The total number of training steps, used to size the loss history.
+
+    generator_device : str or None, optional (default=None)
+        The device the generator runs on.
+
+    discriminator_device : str or None, optional (default=None)
+        The device the discriminator runs on.
+    """
+
+    def __init__(self, generator, discriminator, noise_generator, n_steps,
+                 generator_device=None, discriminator_device=None, **kwargs):
+        super(_SOGAAL_GAN, self).__init__(**kwargs)
+        self.generator = generator
+        self.discriminator = discriminator
+        self.noise_generator = noise_generator
+        self.generator_device = generator_device
+        self.discriminator_device = discriminator_device
+        # Switched off after stop_epochs without retracing the training step
+        self.train_generator = tf.Variable(True, trainable=False)
+        # Per-step discriminator and generator losses, kept on device
+        self.loss_history = tf.Variable(tf.zeros((n_steps, 2)),
+                                        trainable=False)
+        self.step = tf.Variable(0, trainable=False)
+        self.loss_fn = BinaryCrossentropy()
+
+    def compile(self, d_optimizer, g_optimizer, **kwargs):
+        # A single XLA cluster cannot span several devices
+        super(_SOGAAL_GAN, self).compile(
+            jit_compile=self.generator_device == self.discriminator_device,
+            **kwargs)
+        self.d_optimizer = d_optimizer
+        self.g_optimizer = g_optimizer
+        self._initial_values = [v.numpy() for v in self._state_variables()]
+
+    def _state_variables(self):
+        return (self.generator.variables + self.discriminator.variables +
+                self.d_optimizer.variables + self.g_optimizer.variables +
+                [self.train_generator, self.loss_history, self.step])
+
+    def restore_initial_state(self):
+        """Reset the weights, the optimizer states and the loss history to
+        their values at compile time, so that the compiled training step can
+        be reused for a new fit.
+        """
+        for variable, value in zip(self._state_variables(),
+                                   self._initial_values):
+            variable.assign(value)
+
+    def call(self, inputs, training=False):
+        with tf.device(self.generator_device):
+            fake = self.generator(inputs, training=training)
+        with tf.device(self.discriminator_device):
+            return self.discriminator(fake, training=training)
+
+    def train_step(self, data_batch):
+        batch_size = data_batch.shape[0]
+        y = tf.concat([tf.ones((batch_size, 1)), tf.zeros((batch_size, 1))],
+                      axis=0)
+        trick = tf.ones((batch_size, 1))
+
+        # Generate potential outliers; no gradient flows back into the
+        # generator during the discriminator update
+        with tf.device(self.generator_device):
+            noise = self.noise_generator.uniform(
+                data_batch.shape, minval=0., maxval=1., dtype=tf.float32)
+            fake = tf.stop_gradient(tf.cast(
+                self.generator(noise, training=False), data_batch.dtype))
+
+        # Train discriminator on real data and potential outliers
+        with tf.GradientTape() as tape, tf.device(self.discriminator_device):
+            x = tf.concat([data_batch, fake], axis=0)
+            d_loss = self.loss_fn(y, self.discriminator(x, training=True))
+            d_scaled_loss = self.d_optimizer.scale_loss(d_loss)
+        d_vars = self.discriminator.trainable_variables
+        d_grads = tape.gradient(d_scaled_loss, d_vars)
+        self.d_optimizer.apply_gradients(zip(d_grads, d_vars))
+
+        # Train generator through the updated discriminator
+        def _update_generator():
+            with tf.GradientTape() as tape:
+                loss = self.loss_fn(trick, self(noise, training=True))
+                scaled_loss = self.g_optimizer.scale_loss(loss)
+            g_vars = self.generator.trainable_variables
+            g_grads = tape.gradient(scaled_loss, g_vars)
+            self.g_optimizer.apply_gradients(zip(g_grads, g_vars))
+            return loss
+
+        # Only report the generator loss once training has stopped
+        def _evaluate_generator():
+            return self.loss_fn(trick, self(noise, training=False))
+
+        g_loss = tf.cond(self.train_generator, _update_generator,
+                         _evaluate_generator)
+
+        self.loss_history.scatter_nd_update([[self.step]],
+                                            [tf.stack([d_loss, g_loss])])
+        self.step.assign_add(1)
+        return {'discriminator_loss': d_loss, 'generator_loss': g_loss}
+
+
 class SO_GAAL(BaseDetector):
     """Single-Objective Generative Adversarial Active Learning.
 
@@ -59,6 +180,41 @@ class SO_GAAL(BaseDetector):
     momentum : float, optional (default=0.9)
         The momentum parameter for SGD.
 
+    verbose : int, optional (default=0)
+        Verbosity mode.
+
+        - 0 = silent
+        - 1 = progress bar
+        - 2 = one line per epoch.
+
+    gpu_generator : str or None, optional (default=None)
+        The device to place the generator on, e.g. '/GPU:1'. Together with
+        ``gpu_discriminator``, this splits training over two GPUs so that
+        the generator forward pass overlaps with the discriminator update.
+        If None, the device is chosen by TensorFlow.
+
+    gpu_discriminator : str or None, optional (default=None)
+        The device to place the discriminator on, e.g. '/GPU:0'. If None,
+        the device is chosen by TensorFlow.
+
+    mixed_precision : bool, optional (default=False)
+        If True, the generator and the hidden layer of the discriminator
+        compute in float16 with float32 variables, and the losses are scaled
+        to avoid float16 gradient underflow. This speeds up training on GPUs
+        with float16 Tensor Cores; elsewhere it mostly adds cast overhead.
+
+    quantize : bool, optional (default=False)
+        If True, the discriminator is post-training quantized to int8 with
+        TensorFlow Lite after fitting and all outlier scores, including
+        ``decision_scores_``, are computed by the int8 model. This cuts the
+        memory traffic of scoring large data sets, at the cost of coarser
+        scores with more ties.
+
+    random_state : int or None, optional (default=None)
+        If int, random_state is the seed of the initial weights, of the noise
+        fed to the generator and of the order of the training data; If None,
+        each fit draws them anew.
+
     Attributes
     ----------
     decision_scores_ : numpy array of shape (n_samples,)
@@ -79,13 +235,77 @@ class SO_GAAL(BaseDetector):
     """
 
     def __init__(self, stop_epochs=20, lr_d=0.01, lr_g=0.0001,
-                 decay=1e-6, momentum=0.9, contamination=0.1):
+                 decay=1e-6, momentum=0.9, verbose=0, gpu_generator=None,
+                 gpu_discriminator=None, mixed_precision=False, quantize=False,
+                 random_state=None, contamination=0.1):
         super(SO_GAAL, self).__init__(contamination=contamination)
         self.stop_epochs = stop_epochs
         self.lr_d = lr_d
         self.lr_g = lr_g
         self.decay = decay
         self.momentum = momentum
+        self.verbose = verbose
+        self.gpu_generator = gpu_generator
+        self.gpu_discriminator = gpu_discriminator
+        self.mixed_precision = mixed_precision
+        self.quantize = quantize
+        self.random_state = random_state
+
+    def __getstate__(self):
+        # The training model, the traced scoring function, the TFLite
+        # interpreter and the noise generator cannot be pickled. They are
+        # rebuilt by the next fit or, for the scoring paths, on first use.
+        state = self.__dict__.copy()
+        for key in ('combine_model', '_score_fn', '_tflite',
+                    '_noise_generator', '_model_key'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._score_fn = None
+        self._tflite = None
+
+    def _build_model(self, latent_size, data_size, n_steps, dtype,
+                     weight_seed):
+        with tf.device(self.gpu_discriminator):
+            self.discriminator = create_discriminator(latent_size, data_size,
+                                                      dtype=dtype,
+                                                      seed=weight_seed)
+        with tf.device(self.gpu_generator):
+            self.generator = create_generator(latent_size, dtype=dtype)
+
+        # The scoring path is traced on first use
+        self._score_fn = None
+
+        # Noise is drawn on device inside the training step
+        if self.random_state is None:
+            self._noise_generator = \
+                tf.random.Generator.from_non_deterministic_state()
+        else:
+            self._noise_generator = tf.random.Generator.from_seed(
+                self.random_state)
+
+        # The learning rates decay as lr / (1 + decay * iterations)
+        d_optimizer = SGD(learning_rate=InverseTimeDecay(
+            self.lr_d, decay_steps=1, decay_rate=self.decay),
+            momentum=self.momentum)
+        g_optimizer = SGD(learning_rate=InverseTimeDecay(
+            self.lr_g, decay_steps=1, decay_rate=self.decay),
+            momentum=self.momentum)
+        if dtype is not None:
+            # Scale the losses to avoid underflow of float16 gradients
+            d_optimizer = LossScaleOptimizer(d_optimizer)
+            g_optimizer = LossScaleOptimizer(g_optimizer)
+        d_optimizer.build(self.discriminator.trainable_variables)
+        g_optimizer.build(self.generator.trainable_variables)
+
+        self.combine_model = _SOGAAL_GAN(self.generator, self.discriminator,
+                                         self._noise_generator, n_steps,
+                                         self.gpu_generator,
+                                         self.gpu_discriminator)
+        self.combine_model.compile(d_optimizer=d_optimizer,
+                                   g_optimizer=g_optimizer)
 
     def fit(self, X, y=None):
         """Fit detector. y is ignored in unsupervised methods.
@@ -105,73 +325,108 @@ class SO_GAAL(BaseDetector):
         """
         X = check_array(X)
         self._set_n_classes(y)
+
+        # Convert to float32 once and keep the data as a single constant in
+        # host memory, where the input pipeline runs
+        with tf.device('/CPU:0'):
+            X = tf.constant(np.ascontiguousarray(X, dtype=np.float32))
         latent_size = X.shape[1]
         data_size = X.shape[0]
-        stop = 0
         epochs = self.stop_epochs * 3
-        self.train_history = defaultdict(list)
-
-        self.discriminator = create_discriminator(latent_size, data_size)
-        self.discriminator.compile(
-            optimizer=SGD(lr=self.lr_d, decay=self.decay,
-                          momentum=self.momentum), loss='binary_crossentropy')
-
-        self.generator = create_generator(latent_size)
-        latent = Input(shape=(latent_size,))
-        fake = self.generator(latent)
-        self.discriminator.trainable = False
-        fake = self.discriminator(fake)
-        self.combine_model = Model(latent, fake)
-        self.combine_model.compile(
-            optimizer=SGD(lr=self.lr_g, decay=self.decay,
-                          momentum=self.momentum), loss='binary_crossentropy')
-
-        # Start iteration
-        for epoch in range(epochs):
-            print('Epoch {} of {}'.format(epoch + 1, epochs))
-            batch_size = min(500, data_size)
-            num_batches = int(data_size / batch_size)
-
-            for index in range(num_batches):
-                print('\nTesting for epoch {} index {}:'.format(epoch + 1,
-                                                                index + 1))
-
-                # Generate noise
-                noise_size = batch_size
-                noise = np.random.uniform(0, 1, (int(noise_size), latent_size))
-
-                # Get training data
-                data_batch = X[index * batch_size: (index + 1) * batch_size]
-
-                # Generate potential outliers
-                generated_data = self.generator.predict(noise, verbose=0)
-
-                # Concatenate real data to generated data
-                x = np.concatenate((data_batch, generated_data))
-                y = np.array([1] * batch_size + [0] * int(noise_size))
-
-                # Train discriminator
-                discriminator_loss = self.discriminator.train_on_batch(x, y)
-                self.train_history['discriminator_loss'].append(
-                    discriminator_loss)
-
-                # Train generator
-                if stop == 0:
-                    trick = np.array([1] * noise_size)
-                    generator_loss = self.combine_model.train_on_batch(noise,
-                                                                       trick)
-                    self.train_history['generator_loss'].append(generator_loss)
-                else:
-                    trick = np.array([1] * noise_size)
-                    generator_loss = self.combine_model.evaluate(noise, trick)
-                    self.train_history['generator_loss'].append(generator_loss)
-
-            # Stop training generator
-            if epoch + 1 > self.stop_epochs:
-                stop = 1
-
-        # Detection result
-        self.decision_scores_ = self.discriminator.predict(X)
+        batch_size = min(500, data_size)
+        num_batches = int(data_size / batch_size)
+
+        # Compute in float16 with float32 variables if requested
+        dtype = 'mixed_float16' if self.mixed_precision else None
+
+        # Seeds of the initial weights and of the order of the training data
+        random_state = check_random_state(self.random_state)
+        weight_seed, shuffle_seed = [
+            int(seed) for seed in random_state.randint(MAX_INT, size=2)]
+
+        # Reuse the networks and the compiled functions of a previous fit
+        # with the same configuration, reset to their initial state
+        model_key = (latent_size, data_size, epochs, self.lr_d, self.lr_g,
+                     self.decay, self.momentum, self.gpu_generator,
+                     self.gpu_discriminator, dtype)
+        if getattr(self, '_model_key', None) == model_key:
+            self.combine_model.restore_initial_state()
+            # Draw the initial weights of this fit, as a new build would
+            self.discriminator.set_weights(create_discriminator(
+                latent_size, data_size, dtype=dtype,
+                seed=weight_seed).get_weights())
+            if self.random_state is not None:
+                self._noise_generator.reset_from_seed(self.random_state)
+        else:
+            self._build_model(latent_size, data_size, epochs * num_batches,
+                              dtype, weight_seed)
+            self._model_key = model_key
+
+        # Permute the row indices once per epoch and slice the batches of
+        # that epoch from one contiguous, reordered copy of the data
+        def _epoch_batches(epoch):
+            index = tf.random.experimental.stateless_shuffle(
+                tf.range(data_size),
+                seed=tf.stack([tf.constant(shuffle_seed, dtype=tf.int64),
+                               epoch]))
+            X_shuffled = tf.gather(X, index[:num_batches * batch_size])
+            return tf.reshape(X_shuffled,
+                              (num_batches, batch_size, latent_size))
+
+        dataset = tf.data.Dataset.range(epochs).map(_epoch_batches).unbatch()
+
+        # Prefetch so that batch preparation, and on GPUs the host to device
+        # copy of the next batches, overlaps with the training step
+        if tf.config.list_physical_devices('GPU'):
+            dataset = dataset.apply(tf.data.experimental.prefetch_to_device(
+                self.gpu_discriminator or '/GPU:0', buffer_size=2))
+        else:
+            dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
+
+        # Stop training generator after stop_epochs
+        def _on_epoch_begin(epoch, logs):
+            self.combine_model.train_generator.assign(
+                epoch <= self.stop_epochs)
+
+        self.combine_model.fit(
+            dataset, epochs=epochs, steps_per_epoch=num_batches,
+            shuffle=False, verbose=self.verbose,
+            callbacks=[LambdaCallback(on_epoch_begin=_on_epoch_begin)])
+
+        # Losses of every batch, fetched from the device once
+        loss_history = self.combine_model.loss_history.numpy()
+        self.train_history = {'discriminator_loss': loss_history[:, 0],
+                              'generator_loss': loss_history[:, 1]}
+
+        self._tflite = None
+        if self.quantize:
+            # Convert a float32 copy, as the int8 converter cannot quantize
+            # the float16 ops of a mixed precision discriminator
+            discriminator = create_discriminator(latent_size, data_size,
+                                                 dtype='float32')
+            discriminator.set_weights(self.discriminator.get_weights())
+
+            # Convert from a concrete function, as converting the Keras model
+            # exports a SavedModel that prints to stdout, and calibrate the
+            # int8 ranges on a sample of the training data
+            score_fn = tf.function(
+                lambda x: discriminator(x, training=False))
+            score_fn = score_fn.get_concrete_function(
+                tf.TensorSpec([None, latent_size], tf.float32))
+            converter = tf.lite.TFLiteConverter.from_concrete_functions(
+                [score_fn])
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = lambda: (
+                [X[i:i + 1]] for i in range(min(200, data_size)))
+            converter.target_spec.supported_ops = [
+                tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            self._tflite_model = converter.convert()
+        else:
+            self._tflite_model = None
+
+        # Detection result, computed once after training with a single
+        # forward pass instead of going through the Keras predict loop
+        self.decision_scores_ = self._score(X)
         self._process_decision_scores()
         return self
 
@@ -194,6 +449,32 @@ class SO_GAAL(BaseDetector):
             The anomaly score of the input samples.
         """
         check_is_fitted(self, ['discriminator'])
-        X = check_array(X)
-        pred_scores = self.discriminator.predict(X)
+        X = np.ascontiguousarray(check_array(X), dtype=np.float32)
+        pred_scores = self._score(X)
         return pred_scores
+
+    def _score(self, X):
+        """Score float32 samples with the traced discriminator, or with its
+        int8 version if ``quantize`` is set.
+        """
+        if self._tflite_model is None:
+            if self._score_fn is None:
+                # Trace the scoring path once for inputs of any number of
+                # samples; it is not XLA-compiled, as XLA would recompile for
+                # every new number of samples
+                self._score_fn = tf.function(
+                    lambda x: self.discriminator(x, training=False),
+                    input_signature=[
+                        tf.TensorSpec([None, X.shape[1]], tf.float32)])
+            return self._score_fn(tf.convert_to_tensor(X)).numpy().ravel()
+
+        if self._tflite is None:
+            self._tflite = tf.lite.Interpreter(
+                model_content=self._tflite_model)
+        input_index = self._tflite.get_input_details()[0]['index']
+        output_index = self._tflite.get_output_details()[0]['index']
+        self._tflite.resize_tensor_input(input_index, X.shape)
+        self._tflite.allocate_tensors()
+        self._tflite.set_tensor(input_index, np.asarray(X))
+        self._tflite.invoke()
+        return self._tflite.get_tensor(output_index).ravel()
@@ -6,6 +6,9 @@ import os
 import sys
 
 import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
 # noinspection PyProtectedMember
 from sklearn.utils.testing import assert_equal
 from sklearn.utils.testing import assert_greater
@@ -108,6 +111,19 @@ class TestMO_GAAL(unittest.TestCase):
             self.clf.fit_predict_score(self.X_test, self.y_test,
                                        scoring='something')
 
+    def test_verbose_silent(self):
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            MO_GAAL(k=1, stop_epochs=1, verbose=0).fit(self.X_train)
+        assert_equal(stdout.getvalue(), '')
+
+    def test_verbose_epoch_lines(self):
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            MO_GAAL(k=1, stop_epochs=1, verbose=2).fit(self.X_train)
+        # a header and a summary line per epoch, as Keras fit prints them
+        assert_equal(len(stdout.getvalue().splitlines()), 2 * 3)
+
     def tearDown(self):
         pass
 
@@ -4,10 +4,18 @@ from __future__ import print_function
 
 import os
 import sys
+import pickle
+from copy import deepcopy
 
 import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+from numpy.testing import assert_allclose
 # noinspection PyProtectedMember
 from sklearn.utils.testing import assert_equal
+from sklearn.utils.testing import assert_false
 from sklearn.utils.testing import assert_greater
 from sklearn.utils.testing import assert_greater_equal
 from sklearn.utils.testing import assert_less_equal
@@ -108,6 +116,100 @@ class TestSO_GAAL(unittest.TestCase):
             self.clf.fit_predict_score(self.X_test, self.y_test,
                                        scoring='something')
 
+    def test_decision_function_shape(self):
+        pred_scores = self.clf.decision_function(self.X_test)
+        assert_equal(pred_scores.shape, (self.X_test.shape[0],))
+
+    def test_refit_reproducible(self):
+        clf = SO_GAAL(stop_epochs=2, random_state=42)
+        decision_scores = clf.fit(self.X_train).decision_scores_.copy()
+        clf.fit(self.X_train)
+        assert_allclose(clf.decision_scores_, decision_scores)
+
+        # a refit of a cached model equals a fresh fit with the same seed
+        fresh = SO_GAAL(stop_epochs=2, random_state=42).fit(self.X_train)
+        assert_allclose(fresh.decision_scores_, decision_scores)
+
+    def test_train_history(self):
+        num_batches = self.n_train // min(500, self.n_train)
+        n_steps = self.clf.stop_epochs * 3 * num_batches
+        for key in ('discriminator_loss', 'generator_loss'):
+            assert_equal(self.clf.train_history[key].shape, (n_steps,))
+
+    def test_split_device_placement(self):
+        clf = SO_GAAL(stop_epochs=1, gpu_generator='/CPU:0')
+        clf.fit(self.X_train)
+        # an XLA cluster cannot span devices, so the step is not compiled
+        assert_false(clf.combine_model.jit_compile)
+        assert_equal(clf.decision_scores_.shape, (self.n_train,))
+
+    def test_verbose_silent(self):
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            SO_GAAL(stop_epochs=1, verbose=0).fit(self.X_train)
+        assert_equal(stdout.getvalue(), '')
+
+    def test_verbose_epoch_lines(self):
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            SO_GAAL(stop_epochs=1, verbose=2).fit(self.X_train)
+        # a header and a summary line per epoch, as Keras fit prints them
+        assert_equal(len(stdout.getvalue().splitlines()), 2 * 3)
+
+    def test_noise_on_device(self):
+        # the noise is drawn by a seeded TensorFlow generator in the train
+        # step, so the global NumPy generator is left untouched
+        np_state = np.random.get_state()[1].copy()
+        SO_GAAL(stop_epochs=1, random_state=0).fit(self.X_train)
+        assert_allclose(np.random.get_state()[1], np_state)
+
+    def test_mixed_precision(self):
+        clf = SO_GAAL(stop_epochs=1, mixed_precision=True)
+        clf.fit(self.X_train)
+        assert_equal(clf.generator.layers[-1].dtype_policy.name,
+                     'mixed_float16')
+        pred_scores = clf.decision_function(self.X_test)
+        assert_greater_equal(pred_scores.min(), 0)
+        assert_less_equal(pred_scores.max(), 1)
+
+        clf = SO_GAAL(stop_epochs=1).fit(self.X_train)
+        assert_equal(clf.generator.layers[-1].dtype_policy.name, 'float32')
+
+    def test_quantize(self):
+        for mixed_precision in (False, True):
+            clf = SO_GAAL(stop_epochs=1, mixed_precision=mixed_precision,
+                          quantize=True)
+            stdout = StringIO()
+            with redirect_stdout(stdout):
+                clf.fit(self.X_train)
+            assert_equal(stdout.getvalue(), '')
+            pred_scores = clf.decision_function(self.X_test)
+            assert_equal(pred_scores.shape[0], self.X_test.shape[0])
+            assert_greater_equal(pred_scores.min(), 0)
+            assert_less_equal(pred_scores.max(), 1)
+
+            # the int8 sigmoid output takes multiples of 1 / 256 only
+            assert_true(clf._tflite is not None)
+            assert_allclose(pred_scores * 256, np.round(pred_scores * 256),
+                            atol=1e-3)
+
+            clf = pickle.loads(pickle.dumps(clf))
+            assert_allclose(clf.decision_function(self.X_test), pred_scores)
+
+    def test_pickle(self):
+        pred_scores = self.clf.decision_function(self.X_test)
+        for clf in (pickle.loads(pickle.dumps(self.clf)),
+                    deepcopy(self.clf)):
+            assert_allclose(clf.decision_function(self.X_test), pred_scores,
+                            rtol=1e-6)
+            assert_allclose(clf.decision_scores_, self.clf.decision_scores_)
+
+        # an unpickled detector can be fitted again
+        clf = pickle.loads(pickle.dumps(SO_GAAL(stop_epochs=1).fit(
+            self.X_train)))
+        clf.fit(self.X_train)
+        assert_equal(clf.decision_scores_.shape, (self.n_train,))
+
     def tearDown(self):
         pass
 